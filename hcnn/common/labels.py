@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 
@@ -28,19 +29,22 @@ class InstrumentClassMap(object):
             for item in self.data[classname]:
                 self.reverse_map[item] = classname
 
+        self._allnames = sorted(self.reverse_map.keys())
+        self._classnames = sorted(self.data.keys())
+
         self.index_map = {}
-        for i, classname in enumerate(sorted(self.data.keys())):
+        for i, classname in enumerate(self._classnames):
             self.index_map[classname] = i
 
     @property
     def allnames(self):
         """Return a complete list of all class names for searching the
         dataframe."""
-        return sorted(self.reverse_map.keys())
+        return list(self._allnames)
 
     @property
     def classnames(self):
-        return sorted(self.data.keys())
+        return list(self._classnames)
 
     def __getitem__(self, searchkey):
         """Get the actual class name. (Actually the reverse map)."""
@@ -63,11 +67,27 @@ class InstrumentClassMap(object):
 
     def from_index(self, index):
         """Get the instrument name for an index."""
-        return sorted(self.data.keys())[index]
+        return self._classnames[index]
 
     @property
     def size(self):
         """Return the size of the index map (the number of
         data keys)
         """
-        return len(self.data.keys())
+        return len(self._classnames)
+
+
+@functools.lru_cache()
+def get_instrument_class_map(file_path=CLASS_MAP):
+    """Return a shared InstrumentClassMap for `file_path`, loading the
+    json only the first time it is requested.
+
+    Parameters
+    ----------
+    file_path : str
+
+    Returns
+    -------
+    classmap : InstrumentClassMap
+    """
+    return InstrumentClassMap(file_path)
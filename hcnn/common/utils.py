@@ -1,5 +1,7 @@
 import claudio
 import datetime
+from joblib import delayed
+from joblib import Parallel
 import logging
 import logging.config
 import numpy as np
@@ -7,6 +9,8 @@ import os
 import pandas as pd
 import shutil
 import re
+import soundfile
+import threading
 import wave
 import zipfile
 
@@ -169,6 +173,9 @@ def colored(text, color="yellow"):
             colorama.Style.RESET_ALL)
 
 
+_PARAMS_ITER_RE = re.compile(r'\d+|final')
+
+
 def iter_from_params_filepath(params_filepath):
     """Get the model iteration from the params filepath.
 
@@ -184,7 +191,7 @@ def iter_from_params_filepath(params_filepath):
     iter_name : str
     """
     basename = os.path.basename(params_filepath)
-    return re.search('\d+|final', basename).group(0)
+    return _PARAMS_ITER_RE.search(basename).group(0)
 
 
 class TimerHolder(object):
@@ -218,7 +225,7 @@ class TimerHolder(object):
             results = []
             for key in tuple_or_list:
                 self.timers[key][1] = datetime.datetime.now()
-                results += [self.timers[key][1] - self.timers[key][0]]
+                results.append(self.timers[key][1] - self.timers[key][0])
             return results
 
     def get(self, key):
@@ -242,6 +249,56 @@ class TimerHolder(object):
         return np.mean(values)
 
 
+def wav_duration(filename):
+    """Return the duration of a WAV file in seconds, read from its header.
+
+    Parameters
+    ----------
+    filename : str
+        Path to a WAV file on disk.
+
+    Returns
+    -------
+    duration : float
+        Duration in seconds.
+    """
+    with wave.open(filename, 'rb') as fh:
+        return fh.getnframes() / float(fh.getframerate())
+
+
+def audio_duration(filename):
+    """Return the duration of an audio file in seconds, using the cheapest
+    probe that can handle it.
+
+    WAV headers are read directly; anything else goes through libsndfile.
+    Only formats neither understands (e.g. mp3) pay for claudio/sox.
+
+    Parameters
+    ----------
+    filename : str
+        Path to an audio file on disk.
+
+    Returns
+    -------
+    duration : float
+        Duration in seconds.
+    """
+    if os.path.splitext(filename)[1].lower() == '.wav':
+        try:
+            return wav_duration(filename)
+        except (wave.Error, OSError):
+            # Not plain PCM (e.g. float or extensible), or unreadable;
+            #  let the other readers have a go (or report it).
+            pass
+
+    try:
+        return soundfile.info(filename).duration
+    except RuntimeError:
+        pass
+
+    return claudio.fileio.AudioFile(filename, bytedepth=2).duration
+
+
 def check_audio_file(filename, min_duration=0.0):
     """Check the integrity of an audio file.
     Parameters
@@ -260,15 +317,44 @@ def check_audio_file(filename, min_duration=0.0):
     status = False
     error = None
     try:
-        aobj = claudio.fileio.AudioFile(filename, bytedepth=2)
-        status = aobj.duration >= min_duration
-    except (AssertionError, EOFError, wave.Error, ValueError) as derp:
+        status = audio_duration(filename) >= min_duration
+    except (AssertionError, EOFError, OSError, RuntimeError, wave.Error,
+            ValueError) as derp:
         # This is a claudio bug, eventually will be a SoX error
         error = derp
 
     return status, error
 
 
+def check_audio_files(audio_files, min_duration=0.0, num_cpus=-1, verbose=0):
+    """Check the integrity of a collection of audio files in parallel.
+
+    Parameters
+    ----------
+    audio_files : list of str
+        Paths to audio files on disk.
+
+    min_duration : scalar, default=0.0
+        Minimum time duration for an audio file to be considered valid.
+
+    num_cpus : int, default=-1
+        Number of parallel processes to use for checking.
+
+    verbose : int, default=0
+        Verbosity level for joblib.
+
+    Returns
+    -------
+    failed_files : list of str
+        The audio files which failed the check.
+    """
+    pool = Parallel(n_jobs=num_cpus, verbose=verbose)
+    dcheck = delayed(check_audio_file)
+    statuses = pool(dcheck(fname, min_duration) for fname in audio_files)
+    return [fname for fname, (status, _) in zip(audio_files, statuses)
+            if not status]
+
+
 def setup_logging(level):
     logging.config.dictConfig({
         'version': 1,
@@ -296,19 +382,19 @@ def setup_logging(level):
     # logging.basicConfig(level=logging.DEBUG)
 
 
-def filter_df(unfiltered_df, instrument=None, datasets=[]):
+def filter_df(unfiltered_df, instrument=None, datasets=()):
     """Return a view of the features_df looking at only
     the instrument and datasets specified.
     """
-    new_df = unfiltered_df.copy()
+    mask = np.ones(len(unfiltered_df), dtype=bool)
 
     if instrument:
-        new_df = new_df[new_df["instrument"] == instrument]
+        mask &= (unfiltered_df["instrument"] == instrument).values
 
     if datasets:
-        new_df = new_df[new_df["dataset"].isin(datasets)]
+        mask &= unfiltered_df["dataset"].isin(set(datasets)).values
 
-    return new_df
+    return unfiltered_df[mask]
 
 
 def conditional_colored(value, minval, formatstr="{:0.3f}", color="green"):
@@ -349,9 +435,10 @@ def backfill_noise(array, required_t_len, mu=1e-5, sigma=1e-5):
     additional_samples = required_t_len - current_len
 
     noise_shape = array.shape[:-2] + (additional_samples,) + array.shape[-1:]
-    backfill = np.random.normal(mu, sigma, noise_shape)
-    # Concatenate them:
-    new_data = np.concatenate([array, backfill], axis=-2)
+    new_shape = array.shape[:-2] + (required_t_len,) + array.shape[-1:]
+    new_data = np.empty(new_shape, dtype=array.dtype)
+    new_data[..., :current_len, :] = array
+    new_data[..., current_len:, :] = np.random.normal(mu, sigma, noise_shape)
 
     return new_data
 
@@ -372,29 +459,42 @@ def same_shape_noise(original_signal, scale=1, rng=None):
 
 
 class SliceLogger(object):
+    """Counts how each feature file is sampled by the slicers.
+
+    The slicers may run in a prefetching thread (see
+    `streams.prefetch_stream`) while the training loop saves the log, so
+    all access goes through a lock. Batches that were prefetched but not
+    yet trained on are counted too.
+    """
     def __init__(self):
         self.log = pd.DataFrame(columns=["target", "n_samples",
                                          "n_opened", "n_closed",
                                          "n_errors"])
+        self._lock = threading.Lock()
 
     def start(self, record, target):
         key = record['cqt']
-        if key not in self.log:
-            self.log.loc[key] = [target, 0, 1, 0, 0]
-        else:
-            self.log.loc[key, 'n_opened'] += 1
+        with self._lock:
+            if key not in self.log:
+                self.log.loc[key] = [target, 0, 1, 0, 0]
+            else:
+                self.log.loc[key, 'n_opened'] += 1
 
     def error(self, record):
         key = record['cqt']
-        self.log.loc[key, 'n_errors'] += 1
+        with self._lock:
+            self.log.loc[key, 'n_errors'] += 1
 
     def sample(self, record):
         key = record['cqt']
-        self.log.loc[key, 'n_samples'] += 1
+        with self._lock:
+            self.log.loc[key, 'n_samples'] += 1
 
     def close(self, record):
         key = record['cqt']
-        self.log.loc[key, 'n_closed'] += 1
+        with self._lock:
+            self.log.loc[key, 'n_closed'] += 1
 
     def save(self, path):
-        self.log.to_csv(path)
+        with self._lock:
+            self.log.to_csv(path)
@@ -16,6 +16,8 @@ from __future__ import print_function
 
 import argparse
 import claudio
+from concurrent.futures import ThreadPoolExecutor
+import functools
 from joblib import delayed
 from joblib import Parallel
 import json
@@ -24,6 +26,7 @@ import logging
 import numpy as np
 import os
 import pandas as pd
+import soundfile
 import sys
 import time
 
@@ -40,9 +43,66 @@ HARMONIC_PARAMS = dict(n_bins=CQT_PARAMS['n_bins'], n_harmonics=3,
                        fmin=CQT_PARAMS['fmin'],
                        bins_per_octave=CQT_PARAMS['bins_per_octave'])
 
+# The CQT arguments harmonic_cqt forwards to librosa.cqt.
+HARMONIC_CQT_KWARGS = ('hop_length', 'fmin', 'n_bins', 'bins_per_octave',
+                       'tuning', 'filter_scale', 'aggregate', 'norm',
+                       'sparsity', 'real')
+
 AUDIO_PARAMS = dict(samplerate=22050.0, channels=1, bytedepth=2)
 
 
+def read_audio(input_file, samplerate=None, channels=None, bytedepth=None):
+    """Read an audio file into memory.
+
+    Decodes in-process with libsndfile where possible, and only falls back
+    to `claudio.read` (which shells out to sox) for formats libsndfile can't
+    handle, e.g. mp3.
+
+    Parameters
+    ----------
+    input_file : str
+        Path to an audio file.
+
+    samplerate : scalar, default=None
+        Samplerate to return; if None, uses the file's native samplerate.
+
+    channels : int, default=None
+        Number of channels to return; if None, uses the file's channels.
+
+    bytedepth : int, default=None
+        Only used by the claudio fallback.
+
+    Returns
+    -------
+    x : np.ndarray, ndim=2
+        Signal, with shape (time, channels).
+
+    fs : scalar
+        Samplerate of the signal.
+    """
+    try:
+        x, fs = soundfile.read(input_file, dtype='float32', always_2d=True)
+    except RuntimeError:
+        x = None
+
+    if x is None or channels not in (None, 1, x.shape[1]):
+        return claudio.read(input_file, samplerate=samplerate,
+                            channels=channels, bytedepth=bytedepth)
+
+    if channels == 1 and x.shape[1] > 1:
+        x = x.mean(axis=1, keepdims=True)
+
+    if samplerate and fs != samplerate:
+        # Resample each channel as its own 1-D signal; the multichannel
+        #  path in resampy is dramatically slower.
+        x = np.stack([librosa.resample(np.ascontiguousarray(x_c), fs,
+                                       samplerate)
+                      for x_c in x.T], axis=1)
+        fs = samplerate
+
+    return x, fs
+
+
 def harmonic_cqt(x_in, sr, hop_length=1024, fmin=27.5, n_bins=72,
                  n_harmonics=5, bins_per_octave=36, tuning=0.0, filter_scale=1,
                  aggregate=None, norm=1, sparsity=0.0, real=False):
@@ -70,11 +130,13 @@ def harmonic_cqt(x_in, sr, hop_length=1024, fmin=27.5, n_bins=72,
                   filter_scale=filter_scale, aggregate=aggregate, norm=norm,
                   sparsity=sparsity, real=real)
 
+    channels = np.ascontiguousarray(x_in.T, dtype=np.float32)
+
     cqt_spectra = []
     min_tdim = np.inf
     for i in range(1, n_harmonics + 1):
         cqt_spectra += [np.array([librosa.cqt(x_c, fmin=i * fmin, **kwargs).T
-                                  for x_c in x_in.T])[:, np.newaxis, ...]]
+                                  for x_c in channels])[:, np.newaxis, ...]]
         min_tdim = min([cqt_spectra[-1].shape[2], min_tdim])
     cqt_spectra = [x[:, :, :min_tdim, :] for x in cqt_spectra]
 
@@ -97,7 +159,7 @@ def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
         Parameters for the CQT function. See `librosa.cqt`.
 
     audio_params : dict, default=None
-        Parameters for reading the audio file. See `claudio.read`.
+        Parameters for reading the audio file. See `read_audio`.
 
     harmonic_params : dict, default=None
         Parameters for the `harmonic_cqt` function, which will update those in
@@ -136,18 +198,26 @@ def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
     logger.debug("[{0}] Audio conversion {1}".format(
         time.asctime(), input_file))
     try:
-        x, fs = claudio.read(input_file, **audio_params)
+        x, fs = read_audio(input_file, **audio_params)
         if len(x) <= 0:
             logger.error("Bad Input signal length={} for audio {}".format(
                 len(x), input_file))
             return False
         logger.debug("[{0}] Computing features {1}".format(
             time.asctime(), input_file))
-        cqt_spectra = np.array([np.abs(librosa.cqt(x_c, sr=fs, **cqt_params).T)
-                                for x_c in x.T])
-
-        cqt_params.update(**harmonic_params)
-        harm_spectra = harmonic_cqt(x, fs, **cqt_params)
+        harm_kwargs = dict(cqt_params, **harmonic_params)
+        harm_spectra = harmonic_cqt(x, fs, **harm_kwargs)
+
+        # The first harmonic is the plain CQT, but only if cqt_params pins
+        #  down everything harmonic_cqt passes to librosa; any it leaves out
+        #  default differently in harmonic_cqt than in librosa.cqt.
+        if all(k in cqt_params and harm_kwargs[k] == cqt_params[k]
+               for k in HARMONIC_CQT_KWARGS):
+            cqt_spectra = np.abs(harm_spectra[:, 0])
+        else:
+            cqt_spectra = np.array([
+                np.abs(librosa.cqt(x_c, sr=fs, **cqt_params).T)
+                for x_c in np.ascontiguousarray(x.T, dtype=np.float32)])
 
         frame_idx = np.arange(cqt_spectra.shape[1])
         time_points = librosa.frames_to_time(
@@ -166,7 +236,7 @@ def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
 
 def cqt_many(audio_files, output_files, cqt_params=None, audio_params=None,
              harmonic_params=None, num_cpus=-1, verbose=50,
-             skip_existing=True):
+             skip_existing=True, batch_size='auto'):
     """Compute CQT representation over a number of audio files.
 
     Parameters
@@ -189,18 +259,38 @@ def cqt_many(audio_files, output_files, cqt_params=None, audio_params=None,
     num_cpus : int, default=-1
         Number of parallel threads to use for computation.
 
+    verbose : int, default=50
+        Verbosity level for joblib.
+
+    skip_existing : bool, default=True
+        Skip outputs that exist.
+
+    batch_size : int or 'auto', default='auto'
+        Number of files dispatched to a worker at once. Computing a CQT
+        takes long enough that 'auto' will settle on small batches, which
+        keeps stragglers from holding up the pool; set an int to trade
+        that for less dispatch overhead.
+
     Returns
     -------
     failed_files : array of audio_files
         Array indicating which files failed to load.
     """
-    pool = Parallel(n_jobs=num_cpus, verbose=50)
-    dcqt = delayed(cqt_one)
-    pairs = zip(audio_files, output_files)
-    statuses = pool(dcqt(fin, fout, cqt_params, audio_params,
-                         harmonic_params, skip_existing)
-                    for fin, fout in pairs)
-    return [audio_files[i] for i, x in enumerate(statuses) if not x]
+    todo = list(range(len(audio_files)))
+    if skip_existing:
+        todo = [i for i in todo
+                if not (os.path.exists(output_files[i]) and
+                        os.path.exists(audio_files[i]))]
+        logger.info("Skipping {} existing outputs.".format(
+            len(audio_files) - len(todo)))
+
+    pool = Parallel(n_jobs=num_cpus, verbose=verbose, batch_size=batch_size,
+                    pre_dispatch='2*n_jobs')
+    dcqt = delayed(functools.partial(
+        cqt_one, cqt_params=cqt_params, audio_params=audio_params,
+        harmonic_params=harmonic_params, skip_existing=skip_existing))
+    statuses = pool(dcqt(audio_files[i], output_files[i]) for i in todo)
+    return [audio_files[i] for i, x in zip(todo, statuses) if not x]
 
 
 def cqt_from_dataset(dataset, write_dir,
@@ -258,14 +348,18 @@ def cqt_from_dataset(dataset, write_dir,
                             harmonic_params, num_cpus, verbose, skip_existing)
     logger.warning("{} files failed to extract.".format(len(failed_files)))
 
-    feats_df = dataset.to_df()
-    feats_df['cqt'] = pd.Series([None] * len(feats_df), index=feats_df.index)
+    # Threads suffice here; stat() releases the GIL.
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        exists = list(executor.map(os.path.exists, cqt_paths))
+
+    for path in (p for p, ok in zip(cqt_paths, exists) if not ok):
+        logger.warning("CQT Not successfully created: {}".format(path))
+
     # Update the features field if the file was successfully created.
-    for i, path in enumerate(cqt_paths):
-        if os.path.exists(path):
-            feats_df.loc[feats_df.index[i], "cqt"] = path
-        else:
-            logger.warning("CQT Not successfully created: {}".format(path))
+    feats_df = dataset.to_df()
+    feats_df['cqt'] = pd.Series(
+        [path if ok else None for path, ok in zip(cqt_paths, exists)],
+        index=feats_df.index, dtype=object)
 
     return DS.Dataset(feats_df, dataset.split)
 
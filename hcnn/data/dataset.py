@@ -7,6 +7,7 @@ file or dataframe.
 import json
 import jsonschema
 import logging
+import numpy as np
 import os
 import pandas as pd
 import requests
@@ -60,13 +61,16 @@ class Observation(object):
         self.features = features if features else dict()
 
     @classmethod
-    def from_record(cls, record):
+    def from_record(cls, record, index=None):
         """
         Parameters
         ----------
-        record : pandas.Series
+        record : pandas.Series or dict
+
+        index : hashable, default=None
+            Index for the observation; if None, uses `record.name`.
         """
-        return cls(index=record.name,
+        return cls(index=record.name if index is None else index,
                    dataset=record.get('dataset', None),
                    audio_file=record.get('audio_file',
                                          record.get('note_file', None)),
@@ -84,6 +88,17 @@ class Observation(object):
     def __getitem__(self, key):
         return self.__dict__[key]
 
+    def to_flat_dict(self):
+        """Convert to a flat dict (ie make features a key)
+
+        Returns
+        -------
+        dict
+        """
+        flat_dict = self.to_dict()
+        flat_dict.update(**flat_dict.pop("features"))
+        return flat_dict
+
     def to_series(self):
         """Convert to a flat series (ie make features a column)
 
@@ -91,9 +106,7 @@ class Observation(object):
         -------
         pd.Series
         """
-        flat_dict = self.to_dict()
-        flat_dict.update(**flat_dict.pop("features"))
-        return pd.Series(flat_dict)
+        return pd.Series(self.to_flat_dict())
 
     def validate(self, schema=None):
         schema = self.SCHEMA if schema is None else schema
@@ -113,11 +126,10 @@ class Observation(object):
 def expand_audio_paths(df, data_root):
     # Update the paths to full paths, and make sure it's
     # saved in 'audio_file'
+    assert 'audio_file' in df.columns
     new_df = df.copy()
-    for idx, item in new_df.iterrows():
-        assert 'audio_file' in item
-        new_df.loc[idx, 'audio_file'] = os.path.expanduser(
-            os.path.join(data_root, item['audio_file']))
+    new_df['audio_file'] = [os.path.expanduser(os.path.join(data_root, x))
+                            for x in new_df['audio_file']]
     return new_df
 
 
@@ -128,8 +140,7 @@ class Dataset(object):
 
     @classmethod
     def from_observations(cls, observations):
-        obs_series = [x.to_series() for x in observations]
-        return cls(pd.DataFrame(obs_series))
+        return cls(pd.DataFrame([x.to_flat_dict() for x in observations]))
 
     @classmethod
     def load(cls, path, data_root=None):
@@ -138,6 +149,8 @@ class Dataset(object):
             return cls.read_json(path, data_root)
         elif ext == '.csv':
             return cls.read_csv(path, data_root)
+        elif ext == '.parquet':
+            return cls.read_parquet(path, data_root)
         else:
             raise NotImplementedError()
 
@@ -159,6 +172,13 @@ class Dataset(object):
             df = expand_audio_paths(df, data_root)
         return cls(df)
 
+    @classmethod
+    def read_parquet(cls, parquet_path, data_root=None):
+        df = pd.read_parquet(parquet_path, engine='pyarrow')
+        if data_root:
+            df = expand_audio_paths(df, data_root)
+        return cls(df)
+
     def copy(self):
         return Dataset(self.df.copy(), self.split)
 
@@ -170,12 +190,24 @@ class Dataset(object):
         self.df.to_csv(csv_path)
         return os.path.exists(csv_path)
 
+    def save_parquet(self, parquet_path):
+        """Write the dataset as a (zstd compressed) parquet file.
+
+        Parquet is columnar and dictionary-encodes the repetitive string
+        columns, so it's much smaller and faster to reload than csv.
+        """
+        self.df.to_parquet(parquet_path, engine='pyarrow',
+                           compression='zstd')
+        return os.path.exists(parquet_path)
+
     def save(self, path):
         _, ext = os.path.splitext(path)
         if ext == '.csv':
             self.save_csv(path)
         elif ext == '.json':
             self.save_json(path)
+        elif ext == '.parquet':
+            self.save_parquet(path)
         else:
             raise NotImplementedError()
 
@@ -195,10 +227,9 @@ class Dataset(object):
         return df_as_list
 
     def as_observations(self):
-        obs = []
-        for idx, item in self.df.iterrows():
-            obs.append(Observation.from_record(item))
-        return obs
+        records = self.df.to_dict(orient='records')
+        return [Observation.from_record(item, index=idx)
+                for idx, item in zip(self.df.index, records)]
 
     def __len__(self):
         return len(self.df)
@@ -218,19 +249,13 @@ class Dataset(object):
         """Return a copy of the dataset, filtering on dataset name
         or instrument
         """
-        result = self.df.copy()
+        mask = np.ones(len(self.df), dtype=bool)
         if dataset_name:
-            if invert:
-                result = result[result['dataset'] != dataset_name]
-            else:
-                result = result[result['dataset'] == dataset_name]
+            mask &= (self.df['dataset'] == dataset_name).values != invert
         if instrument:
-            if invert:
-                result = result[result['instrument'] != instrument]
-            else:
-                result = result[result['instrument'] == instrument]
+            mask &= (self.df['instrument'] == instrument).values != invert
 
-        return Dataset(result)
+        return Dataset(self.df[mask])
 
     def test_set(self, selected_set):
         """Assumption: a "test set" is simply all of the samples from
@@ -282,8 +307,7 @@ class Dataset(object):
 
         selected_instruments_train = []
         selected_instruments_valid = []
-        for instrument in df["instrument"].unique():
-            instrument_df = df[df["instrument"] == instrument]
+        for instrument, instrument_df in df.groupby("instrument", sort=False):
 
             if len(instrument_df) < 2:
                 logger.warning("Instrument {} doesn't haven enough samples "
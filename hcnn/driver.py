@@ -20,6 +20,11 @@ import pandas as pd
 import shutil
 import sklearn.metrics
 
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
 import hcnn.common.config as C
 import hcnn.common.utils as utils
 import hcnn.data.cqt
@@ -63,8 +68,8 @@ class Driver(object):
         model_dir = os.path.expanduser(
             C.Config.load(config_path)['paths']['model_dir'])
 
-        return [x for x in os.listdir(model_dir)
-                if os.path.isdir(os.path.join(model_dir, x))]
+        return [entry.name for entry in scandir(model_dir)
+                if entry.is_dir()]
 
     def __init__(self, config, partitions=None,
                  model_name=None,
@@ -303,34 +308,38 @@ class Driver(object):
         dataset_df = self.dataset.to_df()
         datasets = ["rwc", "uiowa", "philharmonia"]
 
-        def print_datasetcount(dataset):
+        dataset_counts = dataset_df["dataset"].value_counts()
+        for dataset in datasets:
             print("{:<20} {:<30}".format(
                 "{} count".format(dataset),
-                len(dataset_df[dataset_df["dataset"] == dataset])))
-        for dataset in datasets:
-            print_datasetcount(dataset)
-
-        def print_dataset_instcount(df, instrument):
-            inst_filter = df[df["instrument"] == instrument]
-            print("{:<20} {:<30} {:<30} {:<30}".format(
-                "{} count".format(instrument),
-                len(inst_filter[inst_filter["dataset"] == "rwc"]),
-                len(inst_filter[inst_filter["dataset"] == "uiowa"]),
-                len(inst_filter[inst_filter["dataset"] == "philharmonia"])))
+                int(dataset_counts.get(dataset, 0))))
 
-        classmap = hcnn.common.labels.InstrumentClassMap()
+        classmap = hcnn.common.labels.get_instrument_class_map()
+        classnames = set(classmap.allnames)
+        inst_counts = dataset_df.groupby(
+            ["instrument", "dataset"]).size().unstack(fill_value=0)
 
         print("---------------------------")
         print("Datasets-Instrument count / dataset")
         print("---------------------------")
         print(utils.colored("{:<20} {:<30} {:<30} {:<30}".format(
             "item", "rwc", "uiowa", "philharmonia")))
-        for inst in sorted(dataset_df["instrument"].unique()):
-            if inst in classmap.allnames:
-                print_dataset_instcount(dataset_df, inst)
+        for inst in sorted(inst_counts.index):
+            if inst in classnames:
+                counts = inst_counts.loc[inst]
+                print("{:<20} {:<30} {:<30} {:<30}".format(
+                    "{} count".format(inst),
+                    *[int(counts.get(ds, 0)) for ds in datasets]))
 
     @property
     def feature_ds_path(self):
+        # Always parquet, whatever the format of the source index.
+        index_name = os.path.splitext(os.path.basename(self.dataset_index))[0]
+        return os.path.join(self.feature_dir, index_name + ".parquet")
+
+    @property
+    def legacy_feature_ds_path(self):
+        """Where the features index was written before it was parquet."""
         return os.path.join(
             self.feature_dir, os.path.basename(self.dataset_index))
 
@@ -339,7 +348,12 @@ class Driver(object):
             if as_dataset:
                 return hcnn.data.dataset.Dataset.load(self.feature_ds_path)
             else:
-                return pd.read_csv(self.feature_ds_path, index_col=0)
+                return pd.read_parquet(self.feature_ds_path,
+                                       engine='pyarrow')
+        elif os.path.exists(self.legacy_feature_ds_path):
+            dataset = hcnn.data.dataset.Dataset.load(
+                self.legacy_feature_ds_path)
+            return dataset if as_dataset else dataset.to_df()
 
     def extract_features(self):
         """Extract CQTs from all files collected in collect."""
@@ -347,6 +361,10 @@ class Driver(object):
             logger.info(utils.colored("--skip_features selected; "
                         "loading from the constructed dataframe instead."))
             updated_ds = self.load_existing_features()
+            if updated_ds is None:
+                raise OSError("No features index at {}; run without "
+                              "--skip_features to extract the features."
+                              .format(self.feature_ds_path))
         else:
             logger.info(utils.colored("Extracting features."))
             updated_ds = hcnn.data.cqt.cqt_from_dataset(
@@ -414,17 +432,21 @@ class Driver(object):
 
         timers = utils.TimerHolder()
         iter_count = 0
-        train_stats = pd.DataFrame(columns=['timestamp',
-                                            'batch_train_dur',
-                                            'iteration', 'loss'])
+        train_stats = []
         min_train_loss = np.inf
+        # Running total of the losses since the last status print.
+        window_loss_sum = 0.0
+        window_loss_n = 0
 
         timers.start("train")
         logger.info("[{}] Beginning training loop at {}".format(
             self.experiment_name, timers.get("train")))
+        deadline = timers.get("train") + datetime.timedelta(seconds=max_time)
+        now = datetime.datetime.now
+        prefetched = streams.prefetch_stream(streamer, buffer_size=3)
         try:
             timers.start(("stream", iter_count))
-            for batch in streamer:
+            for batch in prefetched:
                 timers.end(("stream", iter_count))
                 timers.start(("batch_train", iter_count))
                 loss = model.train(batch)
@@ -435,18 +457,22 @@ class Driver(object):
                             ("batch_train", iter_count)),
                            iteration=iter_count,
                            loss=loss)
-                train_stats.loc[len(train_stats)] = row
+                train_stats.append(row)
+                window_loss_sum += float(loss)
+                window_loss_n += 1
 
                 # Time Logging
-                logger.debug("[Iter timing] iter: {} | loss: {} | "
-                             "stream: {} | train: {}".format(
-                                iter_count, loss,
-                                timers.get(("stream", iter_count)),
-                                timers.get(("batch_train", iter_count))))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[Iter timing] iter: {} | loss: {} | "
+                                 "stream: {} | train: {}".format(
+                                    iter_count, loss,
+                                    timers.get(("stream", iter_count)),
+                                    timers.get(("batch_train", iter_count))))
                 # Print status
                 if iter_print_freq and (iter_count % iter_print_freq == 0):
-                    mean_train_loss = \
-                        train_stats["loss"][-iter_print_freq:].mean()
+                    mean_train_loss = window_loss_sum / window_loss_n
+                    window_loss_sum = 0.0
+                    window_loss_n = 0
                     output_str = ("Iteration: {} | Mean_Train_loss: {}"
                                   .format(iter_count,
                                           utils.conditional_colored(
@@ -470,16 +496,18 @@ class Driver(object):
                     logger.info(output_str)
                     min_train_loss = min(mean_train_loss, min_train_loss)
                     # Print the mean times for the last n frames
-                    logger.debug("Mean stream time: {}, Mean train time: {}"
-                                 .format(
-                                     timers.mean(
-                                         "stream",
-                                         iter_count - iter_print_freq,
-                                         iter_count),
-                                     timers.mean(
-                                         "batch_train",
-                                         iter_count - iter_print_freq,
-                                         iter_count)))
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(
+                            "Mean stream time: {}, Mean train time: {}"
+                            .format(
+                                timers.mean(
+                                    "stream",
+                                    iter_count - iter_print_freq,
+                                    iter_count),
+                                timers.mean(
+                                    "batch_train",
+                                    iter_count - iter_print_freq,
+                                    iter_count)))
 
                 # save model, maybe
                 if iter_write_freq and (iter_count % iter_write_freq == 0):
@@ -493,9 +521,7 @@ class Driver(object):
                                              "slice_log.csv")
                     slice_logger.save(slice_log)
 
-                if datetime.datetime.now() > \
-                        (timers.get("train") + datetime.timedelta(
-                            seconds=max_time)):
+                if now() > deadline:
                     raise EarlyStoppingException("Max Time reached")
 
                 iter_count += 1
@@ -511,7 +537,13 @@ class Driver(object):
             logger.warn(
                 utils.colored("Training Stopped for {}".format(e), "red"))
             print("Training halted for: ", e)
+        finally:
+            # Stops the producer thread.
+            prefetched.close()
         timers.end("train")
+        train_stats = pd.DataFrame(train_stats,
+                                   columns=['timestamp', 'batch_train_dur',
+                                            'iteration', 'loss'])
 
         # Print final training loss
         logger.info("Total iterations: {}".format(iter_count))
@@ -580,9 +612,12 @@ class Driver(object):
             os.path.join(self._params_dir, "params*.npz"))
 
         if len(model_files) > 0:
+            selection_config = self.config.get('model_selection') or {}
             result_df, best_model = MS.CompleteLinearWeightedF1Search(
                 model_files, validation_df, slicer, t_len,
-                show_progress=True)()
+                show_progress=True,
+                n_jobs=selection_config.get('num_cpus', 1),
+                patience=selection_config.get('patience', None))()
 
             result_df.to_pickle(validation_error_file)
             best_path = os.path.join(self._params_dir,
@@ -753,7 +788,22 @@ class Driver(object):
         return final_result
 
     def validate_data(self):
-        return True
+        """Check that every audio file in the dataset is readable.
+
+        Returns
+        -------
+        success : bool
+            True if all of the audio files passed.
+        """
+        audio_files = self.dataset.to_df()["audio_file"].tolist()
+        failed_files = utils.check_audio_files(
+            audio_files, num_cpus=self.config.get('features/cqt/num_cpus', -1))
+        for audio_file in failed_files:
+            logger.warning("Invalid audio file: {}".format(audio_file))
+
+        logger.info("{} of {} audio files failed validation.".format(
+            len(failed_files), len(audio_files)))
+        return len(failed_files) == 0
 
     def collect_results(self, result_dir):
         """
@@ -813,9 +863,8 @@ class Driver(object):
                 pred_destination = os.path.join(destination_dir,
                                                 os.path.basename(prediction_file))
                 prediction_df = pd.read_pickle(prediction_file).dropna()
-                prediction_df = pd.DataFrame([
-                    x for index, x in prediction_df.iterrows()
-                    if dataset in index])
+                prediction_df = prediction_df[
+                    [dataset in index for index in prediction_df.index]]
                 # To make this easy, we drop the nan's here.
                 # Possibly this is going to bit me later.
 
@@ -58,6 +58,11 @@ class PredictionAnalyzer(object):
                                "or the dataset column in the predictions_df.")
             self.predictions_df = predictions_df
 
+        # view() filters on this.
+        if "dataset" in self.predictions_df.columns:
+            self.predictions_df = self.predictions_df.assign(
+                dataset=self.predictions_df["dataset"].astype('category'))
+
         self.set_test_set(test_set)
 
     def view(self, dataset):
@@ -1,3 +1,6 @@
+from joblib import cpu_count
+from joblib import delayed
+from joblib import Parallel
 import logging
 import numpy as np
 import pandas
@@ -9,11 +12,17 @@ from . import predict
 
 logger = logging.getLogger(__name__)
 
+# The network last built in this process, shared by every selector in it.
+#  loky's worker processes outlive a single Parallel call, so parallel
+#  evaluations keep their compiled network between tasks as well.
+_network = None
+
 
 class ModelSelector(object):
     """Class to choose a model given a list of model parameters."""
     def __init__(self, param_list, valid_df, slicer_fx, t_len,
-                 show_progress=False):
+                 show_progress=False, n_jobs=1, batch_size=1000,
+                 patience=None):
         """
         Parameters
         ----------
@@ -35,17 +44,38 @@ class ModelSelector(object):
         percent_validation_set : float or None
             Percent (as a float) of the validation set to sample
             when finding the best model.
+
+        n_jobs : int, default=1
+            Number of parallel processes to evaluate params files with.
+            Each evaluation is independent, so -1 (all cpus) is fine if
+            there's memory for that many models.
+
+        batch_size : int, default=1000
+            Number of validation frames passed to the network per call.
+
+        patience : int or None, default=None
+            If given, linear searches stop once this many params files in
+            a row fail to improve on the best so far. None evaluates all.
         """
         # The params list is generated by glob. It is NOT GUARANTEED
         #  to be in order. ... so we need to order it ourselves.
-        param_map = {int(utils.iter_from_params_filepath(x)): x
-                     for x in param_list}
-        # Now create the param_list from the sorted keys
-        self.param_list = [param_map[k] for k in sorted(param_map.keys())]
+        param_list = list(param_list)
+        iterations = np.fromiter(
+            (int(utils.iter_from_params_filepath(x)) for x in param_list),
+            dtype=np.int64, count=len(param_list))
+        order = np.argsort(iterations, kind='mergesort')
+        self.param_list = [param_list[i] for i in order]
         self.valid_df = valid_df
         self.slicer_fx = slicer_fx
         self.t_len = t_len
         self.show_progress = show_progress
+        self.n_jobs = n_jobs
+        self.batch_size = batch_size
+        self.patience = patience
+        # Validation inputs & targets, loaded once; see `validation_set`.
+        self._validation_set = None
+        # Evaluations by params file, kept across `model_search` calls.
+        self._result_cache = {}
 
     def __call__(self):
         """Do the thing.
@@ -73,13 +103,91 @@ class ModelSelector(object):
                 mean_loss
         """
         best_model = None
-        results = []
-        for i, model in enumerate(self.param_list):
-            results += [self.evaluate_model(model)]
-            model_choice = self.compare_models(best_model, results[-1])
-            best_model = results[-1] if model_choice > 0 else best_model
+        results = self.evaluate_until_plateau(self.param_list)
+        for result in results:
+            model_choice = self.compare_models(best_model, result)
+            best_model = result if model_choice > 0 else best_model
         return pandas.DataFrame(results), best_model
 
+    def evaluate_models(self, param_files):
+        """Evaluate several params files, in parallel if n_jobs allows.
+
+        Parameters
+        ----------
+        param_files : list of str
+            Paths to the nn params.
+
+        Returns
+        -------
+        results : list
+            The output of `evaluate_model` for each file, in order.
+        """
+        n_workers = min(self._n_workers(), len(param_files))
+        if n_workers <= 1:
+            return self._evaluate_serially(param_files)
+
+        # Load the validation set here, once; joblib memmaps the arrays
+        #  out to the workers with the selector.
+        self.validation_set()
+        # One contiguous chunk per worker, so each builds its network once.
+        chunks = np.array_split(np.arange(len(param_files)), n_workers)
+        pool = Parallel(n_jobs=n_workers, backend='loky')
+        chunk_results = pool(
+            delayed(self._evaluate_serially)([param_files[i] for i in chunk])
+            for chunk in chunks)
+        return [result for results in chunk_results for result in results]
+
+    def _evaluate_serially(self, param_files):
+        return [self.evaluate_model(x) for x in param_files]
+
+    def _n_workers(self):
+        """The number of processes n_jobs resolves to, as in joblib."""
+        if self.n_jobs > 0:
+            return self.n_jobs
+        return max(cpu_count() + 1 + self.n_jobs, 1)
+
+    def evaluate_until_plateau(self, param_files):
+        """Evaluate params files in order, stopping early once `patience`
+        of them in a row don't improve (by `compare_models`) on the best.
+
+        Parameters
+        ----------
+        param_files : list of str
+            Paths to the nn params, in training order.
+
+        Returns
+        -------
+        results : list
+            The output of `evaluate_model` for each file evaluated, in
+            order; a prefix of param_files if the search stopped early.
+        """
+        if self.patience is None:
+            return self.evaluate_models(param_files)
+
+        # Serially, check after every file. In parallel, each worker gets
+        #  `patience` files per chunk, so stopping may overshoot by up to
+        #  a chunk.
+        n_workers = self._n_workers()
+        chunk_size = 1 if n_workers == 1 else self.patience * n_workers
+        results = []
+        best_model = None
+        since_best = 0
+        for start in range(0, len(param_files), chunk_size):
+            for result in self.evaluate_models(
+                    param_files[start:start + chunk_size]):
+                results.append(result)
+                if self.compare_models(best_model, result) > 0:
+                    best_model, since_best = result, 0
+                else:
+                    since_best += 1
+
+            if since_best >= self.patience:
+                logger.info("No improvement in the last {} params files; "
+                            "stopping after {} of {}.".format(
+                                since_best, len(results), len(param_files)))
+                break
+        return results
+
     def compare_models(self, model_a, model_b):
         """Compare two models, return which one is best.
 
@@ -103,37 +211,108 @@ class ModelSelector(object):
         else:
             return 1 if model_b['mean_loss'] < model_a['mean_loss'] else -1
 
+    def load_model(self, params_file):
+        """Return a model with the params from `params_file` loaded.
+
+        Every checkpoint from a run shares one network definition, so the
+        network is built (and its theano functions compiled) once per
+        process, and later files only swap in their params.
+
+        Parameters
+        ----------
+        params_file : str
+
+        Returns
+        -------
+        model : models.NetworkManager
+        """
+        global _network
+        if _network is not None:
+            try:
+                _network.load_npz_params(params_file)
+                return _network
+            except hcnn.train.models.ParamLoadingError:
+                logger.debug("Network definition changed; rebuilding for "
+                             "{}".format(params_file))
+
+        _network = hcnn.train.models.NetworkManager.deserialize_npz(
+            params_file)
+        return _network
+
+    def validation_set(self):
+        """Return the frames and targets for the whole validation set,
+        loading them the first time this is called.
+
+        Every params file is scored on the same frames, so they are read,
+        sliced, and stacked just once.
+
+        Returns
+        -------
+        x_in : np.ndarray, float32
+            Stacked frames, one observation per row.
+
+        y_true : np.ndarray, int32
+            Index of the true class for each row of x_in.
+        """
+        if self._validation_set is None:
+            logger.debug("Loading {} validation records".format(
+                len(self.valid_df)))
+            records = predict.load_records(
+                self.valid_df, self.slicer_fx, self.t_len, n_jobs=self.n_jobs)
+            loaded = [frames for _, _, frames in records
+                      if frames is not None]
+            if loaded:
+                x_in = np.ascontiguousarray(
+                    np.concatenate([frames['x_in'] for frames in loaded]),
+                    dtype=np.float32)
+                # The slicer's targets are per row, like x_in.
+                y_true = np.concatenate(
+                    [frames['target'] for frames in loaded]).astype(np.int32)
+            else:
+                logger.warning("None of the {} validation records loaded; "
+                               "every model will score NaN.".format(
+                                   len(self.valid_df)))
+                x_in = np.empty(0, dtype=np.float32)
+                y_true = np.empty(0, dtype=np.int32)
+            self._validation_set = (x_in, y_true)
+        return self._validation_set
+
     def evaluate_model(self, params_file):
         """Evaluate a model as defined by a params file, returning
         a single value (mean loss by default) to compare over the validation
-        set."""
-        model = hcnn.train.models.NetworkManager.deserialize_npz(
-            params_file)
+        set.
+
+        Returns
+        -------
+        results : dict
+            With keys mean_loss, mean_acc, f1_weighted, model_file and
+            model_iteration.
+        """
+        model = self.load_model(params_file)
         # Results contains one point accross the whole dataset
         logger.debug("Evaluating params {}".format(params_file))
-        validation_predictions_df = predict.predict_many(
-            self.valid_df, model, self.slicer_fx, self.t_len,
-            show_progress=True).dropna()
-
-        evaluation_results = pandas.Series({
-            "mean_loss": validation_predictions_df['loss'].mean(),
-            "mean_acc": sklearn.metrics.accuracy_score(
-                validation_predictions_df['y_true'].astype(np.int),
-                validation_predictions_df['y_pred'].astype(np.int)),
-            "f1_weighted": sklearn.metrics.f1_score(
-                validation_predictions_df['y_true'].astype(np.int),
-                validation_predictions_df['y_pred'].astype(np.int),
-                average='weighted')
-        })
-        # Include the metadata in the series.
+        x_in, y_true = self.validation_set()
+        y_pred, mean_loss = predict.evaluate_batched(
+            x_in, y_true, model, self.batch_size)
+
         model_iteration = utils.filebase(params_file)[6:]
         model_iteration = int(model_iteration) if model_iteration.isdigit() \
             else model_iteration
 
-        return evaluation_results.append(pandas.Series({
+        if len(y_true):
+            mean_acc = sklearn.metrics.accuracy_score(y_true, y_pred)
+            f1_weighted = sklearn.metrics.f1_score(
+                y_true, y_pred, average='weighted')
+        else:
+            mean_acc = f1_weighted = np.nan
+
+        return {
+            "mean_loss": mean_loss,
+            "mean_acc": mean_acc,
+            "f1_weighted": f1_weighted,
             "model_file": params_file,
             "model_iteration": model_iteration
-        }))
+        }
 
 
 class BinarySearchModelSelector(ModelSelector):
@@ -144,7 +323,7 @@ class BinarySearchModelSelector(ModelSelector):
         Returns
         -------
         results : pandas.DataFrame
-        selected_model : dict or pandas.Series
+        selected_model : dict
             Containing with keys:
                 model_file
                 model_iteration
@@ -162,21 +341,23 @@ class BinarySearchModelSelector(ModelSelector):
             logger.info("Model Search - L:{} R:{}".format(
                 utils.filebase(self.param_list[start_ind]),
                 utils.filebase(self.param_list[end_ind])))
-            if start_ind not in results:
-                model = self.param_list[start_ind]
-                results[start_ind] = self.evaluate_model(model)
-            if end_ind not in results:
-                model = self.param_list[end_ind]
-                results[end_ind] = self.evaluate_model(model)
+            missing = [self.param_list[i] for i in sorted({start_ind, end_ind})
+                       if self.param_list[i] not in self._result_cache]
+            self._result_cache.update(zip(missing,
+                                          self.evaluate_models(missing)))
+            for i in (start_ind, end_ind):
+                results[i] = self._result_cache[self.param_list[i]]
             best_model = self.compare_models(
                 results[start_ind], results[end_ind])
 
-            new_ind = np.int(np.round((end_ind + start_ind) / 2))
+            new_ind = (end_ind + start_ind) // 2
             if (end_ind - start_ind) > 1:
                 start_ind, end_ind = (new_ind, end_ind) if best_model >= 0 \
                     else (start_ind, new_ind)
             else:
-                start_ind, end_ind = (new_ind, new_ind)
+                # Adjacent; both are already evaluated, so take the better.
+                start_ind = end_ind = end_ind if best_model >= 0 \
+                    else start_ind
 
         logger.info("Selected model {} / {}".format(
             start_ind, self.param_list[start_ind]))
@@ -218,7 +399,7 @@ class CompleteLinearWeightedF1Search(ModelSelector):
         Returns
         -------
         results : pandas.DataFrame
-        selected_model : dict or pandas.Series
+        selected_model : dict
             Containing with keys:
                 model_file
                 model_iteration
@@ -241,15 +422,12 @@ class CompleteLinearWeightedF1Search(ModelSelector):
         increment_amount = int(np.round(min(max(10**(np.log10(
             len(self.param_list)) - 1), 1), 25)))
 
-        while index < end_ind:
-            logger.info("Evaluating {}".format(
-                utils.filebase(self.param_list[index])))
-
-            if index not in results:
-                model = self.param_list[index]
-                results[index] = self.evaluate_model(model)
-
-            index += increment_amount
+        indexes = list(range(index, end_ind, increment_amount))
+        results.update(zip(indexes, self.evaluate_until_plateau(
+            [self.param_list[i] for i in indexes])))
+        logger.info("Evaluated {} of {} params files: {}".format(
+            len(results), len(indexes),
+            [utils.filebase(self.param_list[i]) for i in sorted(results)]))
 
         results_df = pandas.DataFrame.from_dict(results, orient='index')
         selected_index = results_df['f1_weighted'].idxmax()
@@ -262,3 +440,25 @@ class CompleteLinearWeightedF1Search(ModelSelector):
         logger.info("For reference, here's the model selection results:")
         logger.info("\n{}".format(results_df.to_string()))
         return results_df, results[selected_index]
+
+    def compare_models(self, model_a, model_b):
+        """Compare two models by the weighted F1 score, which is what
+        this search selects on.
+
+        Parameters
+        ----------
+        model_a : dict or None
+        model_b : dict
+
+        Returns
+        -------
+        best_model : int
+            + if right is best, - if left is best
+        """
+        if model_a is None:
+            return 1
+        elif model_b is None:
+            return -1
+        else:
+            return 1 if model_b['f1_weighted'] > model_a['f1_weighted'] \
+                else -1
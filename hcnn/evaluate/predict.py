@@ -1,14 +1,186 @@
+from joblib import delayed
+from joblib import Parallel
 import logging
 import numpy as np
 import pandas
-import progressbar
+from tqdm import tqdm
 
 import hcnn.common.labels as labels
-instrument_map = labels.InstrumentClassMap()
+instrument_map = labels.get_instrument_class_map()
 
 logger = logging.getLogger(__name__)
 
 
+def load_frames(dfrecord, slicer_fx, t_len):
+    """Return the frames to evaluate for a single record.
+
+    Parameters
+    ----------
+    dfrecord : pandas.Series or dict
+        The record to evaluate.
+
+    slicer_fx : function
+        Function that extracts featuers fr eaach frame
+        from the feature file.
+
+    t_len : int
+
+    Returns
+    -------
+    frames : dict or None
+        The slicer's first batch ({x_in, target}) for this record, or None
+        if the record has no usable features.
+    """
+    # Technically, this should only ever sample one frame,
+    #  but we use the for loop to handle StopIterations smoothly.
+    for frames in slicer_fx(dfrecord, t_len=t_len,
+                            shuffle=False, auto_restart=False,
+                            add_noise=False):
+        return frames
+    return None
+
+
+def _load_record(index, dfrecord, slicer_fx, t_len):
+    target = instrument_map.get_index(dfrecord["instrument"])
+    return index, target, load_frames(dfrecord, slicer_fx, t_len)
+
+
+def load_records(test_df, slicer_fx, t_len, n_jobs=1):
+    """Load the frames for every record in a dataframe.
+
+    Parameters
+    ----------
+    test_df : pandas.DataFrame
+        DataFrame pointing to the features files and targets to evaluate.
+
+    slicer_fx : function
+        Function that extracts featuers fr eaach frame
+        from the feature file.
+
+    t_len : int
+
+    n_jobs : int, default=1
+        Number of parallel processes to load with. Each record is read and
+        sliced independently, so this scales with the number of cores.
+
+    Returns
+    -------
+    records : list of (index, target, frames)
+        Record index, true class index, and frames from `load_frames`.
+    """
+    rows = zip(test_df.index, test_df.to_dict(orient='records'))
+    if n_jobs == 1:
+        return [_load_record(index, row, slicer_fx, t_len)
+                for index, row in rows]
+
+    pool = Parallel(n_jobs=n_jobs)
+    return pool(delayed(_load_record)(index, row, slicer_fx, t_len)
+                for index, row in rows)
+
+
+def predict_frames(frames, target, model, name=None):
+    """Evaluate a model on frames already loaded with `load_frames`.
+
+    Parameters
+    ----------
+    frames : dict or None
+        Frames from `load_frames`.
+
+    target : int
+        Index of the true class.
+
+    model : models.NetworkManager
+
+    name : hashable, default=None
+        Name for the returned series; usually the record's index.
+
+    Returns
+    ------
+    results : pandas.Series
+        All the results stored as a pandas.Series
+    """
+    return predict_records([(name, target, frames)], model)[0]
+
+
+def predict_records(records, model):
+    """Evaluate a model on the frames of several records at once.
+
+    All the records' frames are stacked and sent through the network in a
+    single call, which gives both the predictions and the losses.
+
+    Parameters
+    ----------
+    records : list of (index, target, frames)
+        Record index, true class index, and frames from `load_frames`.
+
+    model : models.NetworkManager
+
+    Returns
+    -------
+    results : list of pandas.Series
+        One per record, as from `predict_frames`.
+    """
+    y_preds = [None] * len(records)
+    losses = [None] * len(records)
+
+    loaded = [i for i, (_, _, frames) in enumerate(records)
+              if frames is not None]
+    if loaded:
+        batch = dict(
+            x_in=np.concatenate([records[i][2]['x_in'] for i in loaded]),
+            target=np.concatenate([records[i][2]['target'] for i in loaded]))
+        predictions, batch_losses = model.predict_and_evaluate(batch)
+        bounds = np.cumsum([0] + [len(records[i][2]['x_in'])
+                                  for i in loaded])
+        for i, start, stop in zip(loaded, bounds[:-1], bounds[1:]):
+            # The class with the maximum likelihood over the record's rows.
+            y_preds[i] = predictions[start:stop].max(axis=0).argmax()
+            losses[i] = batch_losses[start:stop].mean()
+
+    # Return both of these as a dataframe.
+    return [pandas.Series(data=[loss, y_pred, target],
+                          index=['loss', "y_pred", "y_true"],
+                          name=index)
+            for (index, target, _), y_pred, loss in zip(records, y_preds,
+                                                        losses)]
+
+
+def evaluate_batched(x_in, targets, model, batch_size=1000):
+    """Evaluate a model over many frames at once, in fixed size batches.
+
+    Parameters
+    ----------
+    x_in : np.ndarray
+        Stacked frames, one observation per row.
+
+    targets : np.ndarray
+        Index of the true class for each row of x_in.
+
+    model : models.NetworkManager
+
+    batch_size : int
+        Number of rows to pass to the network per call.
+
+    Returns
+    -------
+    y_pred : np.ndarray
+        Predicted class for each row of x_in.
+
+    mean_loss : float
+        Loss averaged over all rows; NaN if there are none.
+    """
+    y_pred = np.empty(len(x_in), dtype=np.intp)
+    losses = np.empty(len(x_in), dtype=np.float64)
+    for start in range(0, len(x_in), batch_size):
+        stop = start + batch_size
+        batch = dict(x_in=x_in[start:stop], target=targets[start:stop])
+        predictions, batch_losses = model.predict_and_evaluate(batch)
+        predictions.argmax(axis=1, out=y_pred[start:stop])
+        losses[start:stop] = batch_losses
+
+    return y_pred, (float(losses.mean()) if len(losses) else np.nan)
+
+
 def predict_one(dfrecord, model, slicer_fx, t_len):
     """Return an evaluation object/dict after evaluating
     a single model using a loaded model.
@@ -35,31 +207,13 @@ def predict_one(dfrecord, model, slicer_fx, t_len):
     results : pandas.Series
         All the results stored as a pandas.Series
     """
-    # Get predictions for every timestep in the file.
     target = instrument_map.get_index(dfrecord["instrument"])
-
-    predictions = []
-    losses = []
-    # Technically, this should only ever sample one frame,
-    #  but we use the for loop to handle StopIterations smoothly.
-    for frames in slicer_fx(dfrecord, t_len=t_len,
-                            shuffle=False, auto_restart=False,
-                            add_noise=False):
-        predictions += [model.predict(frames).argmax()]
-        loss, acc = model.evaluate(frames)
-        losses.append(loss)
-
-    y_pred = predictions[0] if len(predictions) else None
-    loss = losses[0] if len(losses) else None
-
-    # Return both of these as a dataframe.
-    return pandas.Series(
-        data=[loss, y_pred, target],
-        index=['loss', "y_pred", "y_true"],
-        name=dfrecord.name)
+    frames = load_frames(dfrecord, slicer_fx, t_len)
+    return predict_frames(frames, target, model, name=dfrecord.name)
 
 
-def predict_many(test_df, model, slicer_fx, t_len, show_progress=False):
+def predict_many(test_df, model, slicer_fx, t_len, show_progress=False,
+                 batch_size=100, n_jobs=1):
     """Run evaluation on the files in a dataframe.
 
     Parameters
@@ -75,6 +229,15 @@ def predict_many(test_df, model, slicer_fx, t_len, show_progress=False):
 
     t_len : int
 
+    show_progress : bool
+        Show a progress bar.
+
+    batch_size : int
+        Number of records to send through the network per call.
+
+    n_jobs : int
+        Number of parallel processes to load the records' features with.
+
     Returns
     -------
     results_df : pandas.DataFrame
@@ -86,21 +249,20 @@ def predict_many(test_df, model, slicer_fx, t_len, show_progress=False):
             * target
     """
     results = []
-    if show_progress:
-        i = 0
-        progress = progressbar.ProgressBar(max_value=len(test_df))
+    progress = tqdm(total=len(test_df), mininterval=0.5,
+                    disable=not show_progress)
 
     try:
-        for index, row in test_df.iterrows():
-            results += [predict_one(row, model, slicer_fx, t_len)]
-
-            if show_progress:
-                progress.update(i)
-                i += 1
+        for start in range(0, len(test_df), batch_size):
+            records = load_records(test_df.iloc[start:start + batch_size],
+                                   slicer_fx, t_len, n_jobs=n_jobs)
+            results.extend(predict_records(records, model))
+            progress.update(len(records))
     except KeyboardInterrupt:
         logger.error("Evaluation process interrupted; {} of {} evaluated."
                      .format(len(results), len(test_df)))
         logger.error("Recommend you start this process over to evaluate "
                      "them all.")
+    progress.close()
 
     return pandas.DataFrame(results)
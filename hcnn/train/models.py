@@ -5,8 +5,6 @@
   them differently).
   Each returns the training function, and the prediction function.
 """
-import copy
-import glob
 import lasagne
 from lasagne.regularization import regularize_layer_params
 import logging
@@ -15,6 +13,11 @@ import os
 import theano
 import theano.tensor as T
 
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
 from ..data import cqt
 
 
@@ -56,28 +59,51 @@ def list_experiments(config):
     """Given a master config, return a list of available models."""
     model_dir = os.path.expanduser(config['paths/model_dir'])
     logger.debug("Loading models from dir: {}".format(model_dir))
-    experiments = [x for x in os.listdir(model_dir)
-                   if os.path.isdir(os.path.join(model_dir, x))]
+    experiments = [entry.name for entry in scandir(model_dir)
+                   if entry.is_dir()]
     logger.debug("Available Experiments: {}".format(experiments))
+
+    suffixes = {"loss_dfs": "_loss.pkl",
+                "predictions": "_predictions.pkl",
+                "analysis": "_analysis.pkl"}
     experiment_contents = {}
     for experiment in experiments:
-        loss_dfs = glob.glob(os.path.join(model_dir, experiment, "*_loss.pkl"))
-        predictions = glob.glob(os.path.join(
-                                model_dir, experiments, "*_predictions.pkl"))
-        analysis = glob.glob(os.path.join(
-                                model_dir, experiments, "*_analysis.pkl"))
-        experiment_contents[experiments] = dict(
-            loss_dfs=loss_dfs if loss_dfs else None,
-            predictions=predictions if predictions else None,
-            analysis=analysis if analysis else None)
+        contents = {key: [] for key in suffixes}
+        for entry in scandir(os.path.join(model_dir, experiment)):
+            for key, suffix in suffixes.items():
+                if entry.name.endswith(suffix):
+                    contents[key].append(entry.path)
+        experiment_contents[experiment] = {
+            key: (sorted(paths) if paths else None)
+            for key, paths in contents.items()}
     return experiment_contents
 
 
+def load_npz(path):
+    """Read a network definition and its params from an npz written by
+    `NetworkManager.save`.
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    definition : dict
+    params : list of np.ndarray
+        One array per layer param, ready for set_all_param_values.
+    """
+    # The definition is a pickled dict, hence allow_pickle.
+    with np.load(path, allow_pickle=True) as data:
+        return data['definition'].item(), list(data['params'])
+
+
 def names_to_objects(config_dict):
     """Given a configruation dict, convert all values which are strings
     in __layermap__.keys() to their value.
     """
-    config_copy = copy.deepcopy(config_dict)
+    # Callers pop from the layer dicts, so those need new containers.
+    config_copy = {}
     for key, value in config_dict.items():
         if isinstance(value, str):
             # Replace it with the item in the map, or if it's not in the map
@@ -85,11 +111,13 @@ def names_to_objects(config_dict):
             config_copy[key] = __layermap__.get(value, value)
         elif isinstance(value, dict):
             # If it's a dict, call this recursively.
-            config_copy[key] = names_to_objects(config_dict[key])
+            config_copy[key] = names_to_objects(value)
         elif isinstance(value, list):
-            for i, item in enumerate(value):
-                if isinstance(item, dict):
-                    config_copy[key][i] = names_to_objects(config_dict[key][i])
+            config_copy[key] = [names_to_objects(item)
+                                if isinstance(item, dict) else item
+                                for item in value]
+        else:
+            config_copy[key] = value
     return config_copy
 
 
@@ -136,8 +164,8 @@ class NetworkManager(object):
             Full path to a npz? containing the a network definition
             and optionally serialized params.
         """
-        data = np.load(path)
-        return cls(data['definition'].item(), params=data['params'].tolist())
+        definition, params = load_npz(path)
+        return cls(definition, params=params)
 
     def _build_network(self):
         """Constructs the netork from the definition."""
@@ -198,20 +226,65 @@ class NetworkManager(object):
 
         test_prediction = lasagne.layers.get_output(network,
                                                     deterministic=True)
-        test_loss = object_definition['loss'](test_prediction, target_var)
-        test_loss = train_loss.mean()
+        test_losses = object_definition['loss'](test_prediction, target_var)
+        test_loss = test_losses.mean()
         test_acc = T.mean(T.eq(T.argmax(test_prediction, axis=1), target_var),
                           dtype=theano.config.floatX)
 
         self.train_fx = theano.function(
             [input_var, target_var], train_loss, updates=updates_momentum)
-        self.predict_fx = theano.function(
-            [input_var], test_prediction)
-        self.eval_fx = theano.function(
-            [input_var, target_var], [test_loss, test_acc])
+        # predict_fx / eval_fx are compiled on demand; see the properties.
+        self.predict_eval_fx = theano.function(
+            [input_var, target_var],
+            [test_prediction, test_losses, test_loss, test_acc])
+        self._test_graph = dict(
+            input_var=input_var, target_var=target_var,
+            prediction=test_prediction, loss=test_loss, acc=test_acc)
+        self._predict_fx = None
+        self._eval_fx = None
 
         return network
 
+    @property
+    def predict_fx(self):
+        """Theano function from inputs to predictions, compiled lazily."""
+        if self._predict_fx is None:
+            graph = self._test_graph
+            self._predict_fx = theano.function(
+                [graph['input_var']], graph['prediction'])
+        return self._predict_fx
+
+    @property
+    def eval_fx(self):
+        """Theano function from inputs & targets to [loss, accuracy],
+        compiled lazily."""
+        if self._eval_fx is None:
+            graph = self._test_graph
+            self._eval_fx = theano.function(
+                [graph['input_var'], graph['target_var']],
+                [graph['loss'], graph['acc']])
+        return self._eval_fx
+
+    def load_npz_params(self, path):
+        """Load the params from an npz written by `save` into this network,
+        without rebuilding or recompiling it.
+
+        Parameters
+        ----------
+        path : str
+            Full path to an npz with the same network definition as this one.
+
+        Raises
+        ------
+        ParamLoadingError
+            If the npz was saved from a different network definition.
+        """
+        definition, params = load_npz(path)
+        if definition != self.network_definition:
+            raise ParamLoadingError("{} was saved from a different network "
+                                    "definition.".format(path))
+        self._load_params(params)
+
     def _load_params(self, params):
         """Loads the serialized parameters into model.
         The network must exist first, but there's no way you should be calling
@@ -307,9 +380,32 @@ class NetworkManager(object):
         prediction_acc : float
             The accuracy over this batch.
         """
-        return self.eval_fx(np.asarray(batch['x_in'],
-                            dtype=theano.config.floatX),
-                            np.asarray(batch['target'], dtype=np.int32))
+        return self.predict_eval_fx(
+            np.asarray(batch['x_in'], dtype=theano.config.floatX),
+            np.asarray(batch['target'], dtype=np.int32))[2:]
+
+    def predict_and_evaluate(self, batch):
+        """Predict on a batch and score the predictions in a single pass.
+
+        Parameters
+        ----------
+        batch : dict
+            With at least keys:
+            x_in : np.ndarray
+            target : np.ndarray
+
+            where len(x_in) == len(target)
+
+        Returns
+        -------
+        predictions : np.ndarray
+            Returns the predictions for this batch.
+        losses : np.ndarray
+            The loss for each observation in this batch.
+        """
+        return self.predict_eval_fx(
+            np.asarray(batch['x_in'], dtype=theano.config.floatX),
+            np.asarray(batch['target'], dtype=np.int32))[:2]
 
 
 def cqt_iX_f1_oY(n_in, n_out):
@@ -8,6 +8,8 @@ import logging
 import numpy as np
 import os
 import pescador
+import queue
+import threading
 import zipfile
 
 import hcnn.common.utils as utils
@@ -15,7 +17,7 @@ import hcnn.common.labels as labels
 
 logger = logging.getLogger(__name__)
 
-instrument_map = labels.InstrumentClassMap()
+instrument_map = labels.get_instrument_class_map()
 
 
 def base_slicer(record, t_len, obs_slicer, shuffle=True, auto_restart=True,
@@ -42,7 +44,7 @@ def base_slicer(record, t_len, obs_slicer, shuffle=True, auto_restart=True,
 
     Parameters
     ----------
-    record : pandas.Series
+    record : pandas.Series or dict
         Single pandas record containing a 'cqt' record
         which points to the cqt file in question.
         Also must contain an "instrument" column
@@ -85,9 +87,8 @@ def base_slicer(record, t_len, obs_slicer, shuffle=True, auto_restart=True,
     target = instrument_map.get_index(record['instrument'])
     if slice_logger: slice_logger.start(record, target)
 
-    if not (('cqt' in record.index) and
-            record['cqt'] is not None and
-            isinstance(record['cqt'], str) and
+    # Records may be a pandas.Series or a plain dict.
+    if not (isinstance(record.get('cqt'), str) and
             os.path.exists(record['cqt'])):
         logger.error('No valid feature file specified for record: {}'.format(
             record))
@@ -124,9 +125,10 @@ def base_slicer(record, t_len, obs_slicer, shuffle=True, auto_restart=True,
         obs = obs_slicer(cqt, idx, counter, t_len)
         if add_noise:
             obs = obs + utils.same_shape_noise(obs, 1, rng)
+        # The dtypes the network consumes: floatX=float32, int32 targets.
         data = dict(
-            x_in=obs,
-            target=np.atleast_1d((target,)))
+            x_in=np.asarray(obs, dtype=np.float32),
+            target=np.array([target], dtype=np.int32))
         yield data
 
         counter += 1
@@ -346,6 +348,65 @@ def zmq_buffered_stream(stream, batch_size):
     return pescador.zmq_stream(stream, max_batches=batch_size)
 
 
+def prefetch_stream(stream, buffer_size=2):
+    """Produce items from a stream in a background thread, so the next
+    batches are being assembled while the caller works on the current one.
+
+    Parameters
+    ----------
+    stream : iterable
+        Stream to consume, e.g. an InstrumentStreamer.
+
+    buffer_size : int
+        Maximum number of items to produce ahead of the consumer.
+
+    Yields
+    ------
+    item
+        The items of `stream`, in order. Exceptions raised by the stream
+        are re-raised here.
+    """
+    buffer = queue.Queue(maxsize=buffer_size)
+    done = object()
+    # Set when the consumer goes away, so the producer doesn't block
+    #  forever on a full buffer (and keep `stream` alive with it).
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in stream:
+                if not put((item, None)):
+                    return
+        except Exception as derp:
+            put((None, derp))
+            return
+        put((done, None))
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
 class InstrumentStreamer(collections.Iterator):
     """Class wrapping the creation of a pescador streamer
     to sample equally from each instrument class available in
@@ -416,11 +477,11 @@ class InstrumentStreamer(collections.Iterator):
 
     def setup(self):
         """Perform the setup to prepare for streaming."""
-        # Instrument names
-        instruments = list(self.features_df["instrument"].unique())
+        inst_groups = self.features_df.groupby("instrument", sort=False)
 
         # Get Muxes for each instrument.
-        inst_muxes = [self._instrument_mux(i) for i in instruments]
+        inst_muxes = [self._instrument_mux(records)
+                      for _, records in inst_groups]
 
         # Construct the streams for each mux.
         mux_streams = [pescador.Streamer(x) for x in inst_muxes
@@ -440,42 +501,39 @@ class InstrumentStreamer(collections.Iterator):
             self.buffered_streamer = buffer_stream(
                 self.master_stream, self.batch_size)
 
-    def _instrument_streams(self, instrument):
-        """Return a list of generators for all records in the dataframe
-        which match the instrument given, and are in the datasets.
+    def _instrument_streams(self, instrument_records):
+        """Return a list of generators for all records of a single
+        instrument.
 
         Parameters
         ----------
-        instrument : str
-            Instrument to select.
+        instrument_records : pandas.DataFrame
+            The records for one instrument.
 
         Returns
         -------
         streams : list of pescador.Streamer
             One streamer for each instrument file.
         """
-        # Get list of instruments
-        instrument_records = utils.filter_df(
-            self.features_df, instrument=instrument)
         seed_pool = [pescador.Streamer(self.record_slicer, record, self.t_len,
                                        **self.slicer_kwargs)
                      for _, record in instrument_records.iterrows()]
         return seed_pool
 
-    def _instrument_mux(self, instrument):
+    def _instrument_mux(self, instrument_records):
         """Return a pescador.mux for a single instrument.
 
         Parameters
         ----------
-        instrument : str
-            Instrument to select.
+        instrument_records : pandas.DataFrame
+            The records for one instrument.
 
         Returns
         -------
         mux : pescador.mux
             A pescador.mux for a single instrument.
         """
-        streams = self._instrument_streams(instrument)
+        streams = self._instrument_streams(instrument_records)
         if len(streams):
             return pescador.mux(streams, n_samples=None,
                                 **self.instrument_mux_params)
@@ -32,6 +32,8 @@ Arguments:
 
 Options:
  -v --verbose  Increase verbosity.
+ --debug       Compile theano functions with the fast_compile optimizer and
+               verbose exceptions; easier to debug, but far slower to run.
  --skip_features  Prevent the driver from trying to create features.
  --skip_training  Skip the trianing process, and just do the model selection
                and prediction for each model given.
@@ -59,10 +61,6 @@ INT_CONFIG_PATH = os.path.join(os.path.dirname(__file__),
 
 logger = logging.getLogger(__name__)
 
-# theano debug values. probably remove these later.
-theano.config.exception_verbosity = 'high'
-theano.config.optimizer = 'fast_compile'
-
 
 def run_process_if_not_exists(process, filepath, **kwargs):
     if not os.path.exists(filepath):
@@ -445,4 +443,10 @@ if __name__ == "__main__":
     utils.setup_logging(logging.DEBUG if arguments['--verbose']
                         else logging.INFO)
 
+    if arguments['--debug']:
+        # fast_compile skips the graph optimizations (BLAS gemm, fused
+        #  elemwise ops, cuDNN convolutions), so only use it for debugging.
+        theano.config.exception_verbosity = 'high'
+        theano.config.optimizer = 'fast_compile'
+
     handle_arguments(arguments)
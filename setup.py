@@ -30,7 +30,7 @@ setup(
     # Check/confirm.
     liscence='ISC',
     install_requires=[
-        'joblib',
+        'joblib>=0.12',
         'six',
         'pyzmq',
         'numpy',
@@ -34,12 +34,12 @@ def module_workspace(request):
     return test_workspace
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def classmap():
-    return hcnn.common.labels.InstrumentClassMap()
+    return hcnn.common.labels.get_instrument_class_map()
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def tinyds():
     return DS.TinyDataset.load()
 
@@ -1,6 +1,7 @@
 import numpy as np
 import os
 import pytest
+import wave
 
 import hcnn.common.utils as utils
 
@@ -84,6 +85,43 @@ def test_filter_df(tinyds):
            set(["philharmonia", "rwc"])
 
 
+def test_wav_duration(workspace):
+    fname = os.path.join(workspace, "half_second.wav")
+    fh = wave.open(fname, 'wb')
+    fh.setnchannels(1)
+    fh.setsampwidth(2)
+    fh.setframerate(8000)
+    fh.writeframes(np.zeros(4000, dtype=np.int16).tobytes())
+    fh.close()
+
+    assert utils.wav_duration(fname) == 0.5
+    assert utils.audio_duration(fname) == 0.5
+    assert utils.check_audio_file(fname, min_duration=0.25)[0]
+    assert not utils.check_audio_file(fname, min_duration=1.0)[0]
+
+
+def test_check_audio_file_missing(workspace):
+    fname = os.path.join(workspace, "does_not_exist.wav")
+    status, error = utils.check_audio_file(fname)
+    assert not status
+    assert error is not None
+
+
+def test_audio_duration(tinyds):
+    audio_file = tinyds.to_df()["audio_file"].iloc[0]
+    assert utils.audio_duration(audio_file) > 0
+
+
+def test_check_audio_files(tinyds):
+    audio_files = tinyds.to_df()["audio_file"].tolist()[:4]
+    assert not utils.check_audio_files(audio_files, num_cpus=2)
+
+    # Nothing in the tinyset is this long, so they should all fail.
+    failed = utils.check_audio_files(audio_files, min_duration=1e6,
+                                     num_cpus=2)
+    assert failed == audio_files
+
+
 @pytest.fixture(scope="module", params=[
     (1, 1, 10, 100), (1, 2, 10),
     (1, 4, 10, 100, 5), (1, 8, 10),
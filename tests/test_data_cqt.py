@@ -6,6 +6,17 @@ import numpy as np
 import hcnn.data.cqt as CQT
 
 DIRNAME = os.path.dirname(__file__)
+TINYSET_DIR = os.path.join(DIRNAME, os.pardir, "data", "tinyset")
+
+
+def test_read_audio():
+    input_file = os.path.join(TINYSET_DIR,
+                              "philharmonia02530e0330565a.flac")
+    x, fs = CQT.read_audio(input_file, samplerate=22050, channels=1)
+    assert x.ndim == 2
+    assert x.shape[1] == 1
+    assert fs == 22050
+    assert np.abs(x).sum() > 0
 
 
 def test_harmonic_cqt(workspace):
@@ -44,3 +55,16 @@ def test_download_many(workspace):
                     for fname in ('foo.npz', 'bar.npz')]
     # cqt_many returns files that failed; should be none.
     assert not CQT.cqt_many(input_files, output_files)
+
+
+def test_cqt_one_partial_cqt_params(workspace):
+    input_file = os.path.join(DIRNAME, "sax_cres.mp3")
+    output_file = os.path.join(workspace, "partial.npz")
+    # Everything else is left to librosa.cqt's defaults for the CQT, so it
+    #  can't be taken from the first harmonic.
+    assert CQT.cqt_one(input_file, output_file,
+                       cqt_params=dict(hop_length=1024))
+
+    features = np.load(output_file)
+    assert features['cqt'].shape[-1] == 84
+    assert features['harmonic_cqt'].shape[-1] == CQT.CQT_PARAMS['n_bins']
@@ -108,6 +108,19 @@ def test_load_save_dataset_as_csv(tinydata_csv, workspace):
     assert all(ds.to_df().index == ds2.to_df().index)
 
 
+def test_load_save_dataset_as_parquet(tinydata_csv, workspace):
+    ds = dataset.Dataset.read_csv(tinydata_csv, os.path.dirname(tinydata_csv))
+
+    save_path = os.path.join(workspace, "save.parquet")
+    assert ds.save_parquet(save_path)
+    assert os.path.exists(save_path)
+
+    ds2 = dataset.Dataset.load(save_path)
+    assert len(ds) == len(ds2)
+    assert all(ds.to_df().index == ds2.to_df().index)
+    assert all(ds.to_df()["audio_file"] == ds2.to_df()["audio_file"])
+
+
 def test_filter_dataset(tinydata):
     # Filter dataset
     assert len(tinydata.filter(dataset_name="rwc")) == 120
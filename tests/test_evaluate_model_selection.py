@@ -1,3 +1,4 @@
+import pandas
 import pytest
 
 import hcnn.evaluate.model_selection as model_slection
@@ -8,6 +9,70 @@ def test_ModelSelector():
     assert False
 
 
-@pytest.mark.xfail(reason="Todo")
+class CurveSelectorMixin(object):
+    """Scores params files from fixed loss/accuracy curves, without a
+    network."""
+    def __init__(self, losses, accuracies=None, **kwargs):
+        self.losses = losses
+        self.accuracies = accuracies or [0.] * len(losses)
+        self.evaluated = []
+        param_list = ["params/params{:04d}.npz".format(i)
+                      for i in range(len(losses))]
+        super(CurveSelectorMixin, self).__init__(
+            param_list, pandas.DataFrame(), None, 8, **kwargs)
+
+    def evaluate_model(self, params_file):
+        self.evaluated.append(params_file)
+        index = self.param_list.index(params_file)
+        return {"mean_loss": self.losses[index],
+                "mean_acc": self.accuracies[index],
+                "model_file": params_file}
+
+
+class LossCurveSelector(CurveSelectorMixin, model_slection.ModelSelector):
+    pass
+
+
+class BinarySearchCurveSelector(CurveSelectorMixin,
+                                model_slection.BinarySearchModelSelector):
+    pass
+
+
+def test_ModelSelector_patience():
+    losses = [5., 4., 3., 3.5, 3.6, 3.7, 3.8, 2., 1.]
+    selector = LossCurveSelector(losses, patience=3)
+    results_df, best_model = selector()
+    assert len(results_df) == 6
+    assert selector.evaluated == selector.param_list[:6]
+    assert best_model["mean_loss"] == 3.
+
+    # No patience evaluates everything.
+    selector = LossCurveSelector(losses)
+    results_df, best_model = selector()
+    assert len(results_df) == len(losses)
+    assert best_model["mean_loss"] == 1.
+
+
 def test_BinarySearchModelSelector():
-    assert False
+    accuracies = [0., .1, .2, .3, .4, .5, .6, .7, .8]
+    selector = BinarySearchCurveSelector([0.] * len(accuracies), accuracies)
+    results_df, best_model = selector()
+    assert best_model["model_file"] == selector.param_list[-1]
+    # Each file is evaluated at most once...
+    assert len(set(selector.evaluated)) == len(selector.evaluated)
+    assert len(results_df) == len(selector.evaluated)
+
+    # ...even when the selector is reused.
+    n_evaluated = len(selector.evaluated)
+    results_df, best_model = selector()
+    assert len(selector.evaluated) == n_evaluated
+    assert best_model["model_file"] == selector.param_list[-1]
+
+
+@pytest.mark.parametrize("accuracies,expected_index", [
+    ([0., .9, .5], 1),
+    ([0., .5, .9], 2)])
+def test_BinarySearchModelSelector_adjacent(accuracies, expected_index):
+    selector = BinarySearchCurveSelector([0.] * len(accuracies), accuracies)
+    results_df, best_model = selector()
+    assert best_model["model_file"] == selector.param_list[expected_index]
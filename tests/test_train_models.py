@@ -94,6 +94,10 @@ def test_names_to_objects():
     assert object_dict["i'm_a_list"][1]["butishould"] == \
         lasagne.nonlinearities.rectify
 
+    # The result shares no containers with the input.
+    object_dict["i'm_a_list"][0].pop("anotherlayer")
+    assert test_dict["i'm_a_list"][0] == {"anotherlayer": "init.glorot"}
+
 
 def __test_network(network_def, input_shape):
     model = models.NetworkManager(network_def)
@@ -293,6 +297,18 @@ def test_networkmanager_save(workspace, simple_network_def):
     assert model._network is not None
 
 
+def test_networkmanager_load_npz_params(workspace, simple_network_def):
+    save_path = os.path.join(workspace, "output.npz")
+    saved = models.NetworkManager(simple_network_def)
+    saved.save(save_path)
+
+    model = models.NetworkManager(simple_network_def)
+    model.load_npz_params(save_path)
+    for a, b in zip(lasagne.layers.get_all_param_values(saved._network),
+                    lasagne.layers.get_all_param_values(model._network)):
+        assert np.array_equal(a, b)
+
+
 def test_networkmanager_train_and_predict(simple_network_def):
     input_shape = (None, 1, 5, 5)
 
@@ -315,6 +331,20 @@ def test_networkmanager_train_and_predict(simple_network_def):
     assert np.isfinite(loss) and np.isfinite(acc)
 
 
+def test_networkmanager_evaluate_is_deterministic(simple_network_def):
+    model = models.NetworkManager(simple_network_def)
+    batch = dict(
+        x_in=np.random.random((8, 1, 5, 5)),
+        target=np.random.randint(2, size=8))
+
+    # Dropout is disabled when evaluating, so repeated calls must agree,
+    #  and the mean loss must match the per-observation losses.
+    loss, acc = model.evaluate(batch)
+    assert model.evaluate(batch)[0] == loss
+    predictions, losses = model.predict_and_evaluate(batch)
+    assert np.allclose(losses.mean(), loss)
+
+
 def test_networkmanager_t_and_p_experiments(network_def_fn):
     input_shape = (None, 1, 43, 252)
     n_classes = 3
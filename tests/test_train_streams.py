@@ -2,6 +2,8 @@ import numpy as np
 import os
 import pandas as pd
 import pytest
+import threading
+import time
 
 import hcnn.common.config as C
 import hcnn.data.cqt
@@ -185,3 +187,34 @@ def test_instrument_streamer_with_zmq(tiny_feats):
             df, streams.cqt_slices,
             t_len=t_len, batch_size=batch_size, use_zmq=True)
         __test_streamer(streamer, t_len, batch_size)
+
+
+def test_prefetch_stream():
+    assert list(streams.prefetch_stream(iter(range(10)))) == list(range(10))
+
+    def broken():
+        yield 1
+        raise ValueError("oops")
+
+    prefetched = streams.prefetch_stream(broken(), buffer_size=1)
+    assert next(prefetched) == 1
+    with pytest.raises(ValueError):
+        next(prefetched)
+
+
+def test_prefetch_stream_close():
+    def endless():
+        while True:
+            yield 1
+
+    n_threads = threading.active_count()
+    prefetched = streams.prefetch_stream(endless(), buffer_size=1)
+    assert next(prefetched) == 1
+    prefetched.close()
+
+    # The producer notices within one put timeout and exits.
+    for _ in range(50):
+        if threading.active_count() == n_threads:
+            break
+        time.sleep(0.05)
+    assert threading.active_count() == n_threads